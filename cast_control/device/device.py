@@ -1,17 +1,83 @@
 from __future__ import annotations
 
-from typing import NamedTuple, Optional
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait as wait_futures
+from random import uniform
+from socket import AF_INET, IPPROTO_IP, IP_MULTICAST_TTL, SOCK_DGRAM, create_connection, socket, \
+  timeout as SocketTimeout
+from threading import Event, Lock
+from time import monotonic, sleep
+from typing import Callable, Iterable, NamedTuple, Optional, TypeVar
+from urllib.parse import urlparse
+from urllib.request import urlopen
 from uuid import UUID
+from xml.etree import ElementTree
 
-from pychromecast import get_chromecast_from_host, get_chromecasts
+from pychromecast import discover_chromecasts, get_chromecast_from_host, get_chromecasts
 
 from ..base import DEFAULT_NAME, DEFAULT_RETRY_WAIT, Device, NO_PORT, NO_STR
+from ..types import Final
+
+
+DISCOVERY_TTL: Final[float] = 30.0  # seconds
+DISCOVERY_ATTEMPTS: Final[int] = 3
+
+CONNECT_TIMEOUT: Final[float] = 30.0  # seconds
+
+BACKOFF_CAP: Final[float] = 60.0  # seconds
+BACKOFF_ATTEMPTS: Final[int] = 6
+BACKOFF_JITTER: Final[float] = 0.1  # fraction of the current wait
+BACKOFF_MAX_EXP: Final[int] = 16  # keeps 2 ** n from overflowing floats
+NO_FAILURES: Final[int] = 0
+
+RACE_TIMEOUT: Final[float] = 15.0  # seconds
+RACE_WORKERS: Final[int] = 2
+
+STREAM_TIMEOUT: Final[float] = 5.0  # seconds to wait for a matching device
+WAIT_WORKERS: Final[int] = 8
+
+CAST_PORT: Final[int] = 8009
+PROBE_TIMEOUT: Final[float] = 1.0  # seconds
+SSDP_ADDR: Final[tuple[str, int]] = ('239.255.255.250', 1900)
+SSDP_TARGET: Final[str] = 'urn:dial-multiscreen-org:service:dial:1'
+SSDP_MX: Final[int] = 3  # seconds devices may wait before answering
+SSDP_TIMEOUT: Final[float] = SSDP_MX + 1.0
+SSDP_TTL: Final[int] = 2
+SSDP_BUFSIZE: Final[int] = 4096
+SSDP_ENCODING: Final[str] = 'utf-8'
+SSDP_LOCATION: Final[str] = 'location'
+SSDP_REQUEST: Final[bytes] = '\r\n'.join((
+  'M-SEARCH * HTTP/1.1',
+  f'HOST: {SSDP_ADDR[0]}:{SSDP_ADDR[1]}',
+  'MAN: "ssdp:discover"',
+  f'MX: {SSDP_MX}',
+  f'ST: {SSDP_TARGET}',
+  '',
+  '',
+)).encode(SSDP_ENCODING)
+
+DESC_SCHEMES: Final[frozenset[str]] = frozenset({'http', 'https'})
+SSDP_MAX_DESC: Final[int] = 64 * 1024  # bytes, descriptions are a few KB
+
+UPNP_NS: Final[dict[str, str]] = {'upnp': 'urn:schemas-upnp-org:device-1-0'}
+UUID_PREFIX: Final[str] = 'uuid:'
+
+
+T = TypeVar('T')
+
+
+# when hosts were last discovered, and what was found
+_discovered: Optional[tuple[float, tuple[Host, ...]]] = None
+
+# consecutive failures per host, so that repeated calls to
+# `find_device()` pick up where the last backoff left off
+_host_failures: dict[str, int] = {}
 
 
 class Host(NamedTuple):
   host: str
   port: Optional[int] = NO_PORT
-  uuid: str = NO_STR
+  uuid: UUID | str = NO_STR
   model_name: str = NO_STR
   friendly_name: str = DEFAULT_NAME
 
@@ -25,94 +91,463 @@ def get_device_via_host(
     name = DEFAULT_NAME
 
   info = Host(host, friendly_name=name)
-  device = get_chromecast_from_host(info, retry_wait=retry_wait)
 
-  if device:
-    device.wait()
-    return device
+  def connect() -> Optional[Device]:
+    if device := get_chromecast_from_host(info, retry_wait=retry_wait):
+      return _wait_for_connection(device)
 
-  return None  # explicit
+    return None
 
+  return _retry_with_backoff(connect, base=retry_wait, key=host)
 
-def get_devices(
-  retry_wait: Optional[float] = DEFAULT_RETRY_WAIT
-) -> list[Device]:
-  devices, service_browser = get_chromecasts(retry_wait=retry_wait)
+
+def _wait_for_connection(
+  device: Device,
+  timeout: float = CONNECT_TIMEOUT,
+) -> Optional[Device]:
+  device.wait(timeout=timeout)
+
+  if device.status is None:  # never connected
+    _disconnect(device)
+    return None
+
+  return device
+
+
+def _connect_once(device: Device, tried: set[int]) -> Optional[Device]:
+  '''A `Device`'s socket thread can only start once, skip ones already tried'''
+  if id(device) in tried:
+    return None
+
+  tried.add(id(device))
+
+  return _wait_for_connection(device)
+
+
+def _disconnect(device: Device):
+  try:
+    device.disconnect(blocking=False)
+
+  except RuntimeError as e:  # socket thread never started
+    logging.debug(f"Couldn't disconnect from {device}: {e}")
+
+
+def _get_backoff(
+  failures: int,
+  base: float,
+  cap: float = BACKOFF_CAP,
+) -> float:
+  exp = min(failures, BACKOFF_MAX_EXP)
+  wait = min(cap, base * 2 ** exp)
+  jitter = uniform(0, wait * BACKOFF_JITTER)
+
+  return wait + jitter
+
+
+def _retry_with_backoff(
+  callable_: Callable[[], Optional[T]],
+  base: Optional[float] = DEFAULT_RETRY_WAIT,
+  cap: float = BACKOFF_CAP,
+  max_attempts: int = BACKOFF_ATTEMPTS,
+  key: Optional[str] = None,
+) -> Optional[T]:
+  """
+    Call `callable_` until it returns a result, doubling the wait
+    between failed attempts up to `cap` seconds.
+
+    If `key` is given, the failure count is kept between calls and
+    reset once `callable_` succeeds.
+  """
+  base = float(base or DEFAULT_RETRY_WAIT)
+  failures: int = _host_failures.get(key, NO_FAILURES) if key else NO_FAILURES
+
+  for attempt in range(1, max_attempts + 1):
+    try:
+      result = callable_()
+
+    except Exception as e:
+      logging.debug(f'Attempt {attempt} failed: {e}')
+      result = None
+
+    if result is not None:
+      if key:
+        _host_failures.pop(key, None)
+
+      return result
+
+    wait = _get_backoff(failures, base, cap)
+    failures += 1
+
+    if key:
+      _host_failures[key] = failures
+
+    if attempt < max_attempts:
+      logging.info(f'Retrying in {wait:.1f} seconds.')
+      sleep(wait)
+
+  return None
+
+
+def _discover_via_mdns() -> list[Host]:
+  cast_infos, service_browser = discover_chromecasts()
   service_browser.stop_discovery()
 
-  return devices
+  return [
+    Host(info.host, info.port, info.uuid, info.model_name, info.friendly_name)
+    for info in cast_infos
+    if info.host
+  ]
+
+
+def _search_ssdp(timeout: float = SSDP_TIMEOUT) -> set[str]:
+  '''Send a DIAL M-SEARCH and collect the LOCATION of each reply'''
+  locations: set[str] = set()
+  deadline = monotonic() + timeout
+
+  with socket(AF_INET, SOCK_DGRAM) as sock:
+    sock.setsockopt(IPPROTO_IP, IP_MULTICAST_TTL, SSDP_TTL)
+    sock.sendto(SSDP_REQUEST, SSDP_ADDR)
+
+    while (remaining := deadline - monotonic()) > 0:
+      sock.settimeout(remaining)
 
+      try:
+        data, _ = sock.recvfrom(SSDP_BUFSIZE)
 
-def get_first(devices: list[Device]) -> Optional[Device]:
-  if not devices:
+      except SocketTimeout:
+        break
+
+      for line in data.decode(SSDP_ENCODING, errors='ignore').splitlines():
+        header, _, value = line.partition(':')
+
+        if header.strip().casefold() == SSDP_LOCATION:
+          locations.add(value.strip())
+
+  return locations
+
+
+def _get_host_from_location(location: str) -> Optional[Host]:
+  '''Read a DIAL device description into a `Host` for pychromecast'''
+  url = urlparse(location)
+
+  # replies come from anything on the LAN, only fetch plain web URLs
+  if url.scheme not in DESC_SCHEMES or not (ip := url.hostname):
     return None
 
-  first, *_ = devices
-  first.wait()
+  with urlopen(location, timeout=SSDP_TIMEOUT) as response:
+    root = ElementTree.fromstring(response.read(SSDP_MAX_DESC))
 
-  return first
+  if (device := root.find('upnp:device', UPNP_NS)) is None:
+    return None
 
+  name = device.findtext('upnp:friendlyName', DEFAULT_NAME, UPNP_NS)
+  model = device.findtext('upnp:modelName', NO_STR, UPNP_NS)
+  udn = device.findtext('upnp:UDN', NO_STR, UPNP_NS)
+  uuid = UUID(udn.removeprefix(UUID_PREFIX)) if udn else NO_STR
 
-def get_device_via_uuid(
+  return Host(ip, CAST_PORT, uuid, model, name)
+
+
+def _is_cast_host(ip: str, timeout: float = PROBE_TIMEOUT) -> bool:
+  '''Other DIAL devices answer SSDP too, only Cast devices listen on 8009'''
+  try:
+    with create_connection((ip, CAST_PORT), timeout=timeout):
+      return True
+
+  except OSError:
+    return False
+
+
+def _resolve_location(location: str) -> Optional[Host]:
+  try:
+    host = _get_host_from_location(location)
+
+  except Exception as e:
+    logging.debug(f"Couldn't read device description at {location}: {e}")
+    return None
+
+  if not host or not _is_cast_host(host.host):
+    return None
+
+  return host
+
+
+def _discover_via_ssdp() -> list[Host]:
+  if not (locations := _search_ssdp()):
+    return []
+
+  with ThreadPoolExecutor(min(len(locations), WAIT_WORKERS)) as executor:
+    hosts = executor.map(_resolve_location, locations)
+
+    return [host for host in hosts if host]
+
+
+def _dedupe(hosts: Iterable[Host]) -> list[Host]:
+  unique: dict[UUID | str, Host] = {}
+
+  for host in hosts:
+    key = host.uuid or host.host
+    unique.setdefault(key, host)
+
+  return list(unique.values())
+
+
+def _get_result(future: Future[list[T]]) -> list[T]:
+  try:
+    return future.result()
+
+  except Exception as e:
+    logging.debug(f'Discovery failed: {e}')
+    return []
+
+
+def _race_discovery() -> list[Host]:
+  """
+    Run mDNS and SSDP discovery side by side and merge whatever
+    either finds within `RACE_TIMEOUT`. mDNS can be slow or stop
+    answering on some devices, while SSDP still gets a reply, but
+    only mDNS sees cast groups.
+  """
+  executor = ThreadPoolExecutor(RACE_WORKERS)
+  # mDNS first, so its entries win when both find the same device
+  futures: list[Future[list[Host]]] = [
+    executor.submit(_discover_via_mdns),
+    executor.submit(_discover_via_ssdp),
+  ]
+  hosts: list[Host] = []
+
+  try:
+    done, _ = wait_futures(futures, timeout=RACE_TIMEOUT)
+
+    for future in futures:
+      if future in done:
+        hosts.extend(_get_result(future))
+
+  finally:
+    executor.shutdown(wait=False, cancel_futures=True)
+
+  return _dedupe(hosts)
+
+
+def _discover_hosts(
+  retry_wait: Optional[float] = DEFAULT_RETRY_WAIT
+) -> tuple[Host, ...]:
+  '''Discovered hosts are reused for `DISCOVERY_TTL` seconds'''
+  global _discovered
+
+  if _discovered:
+    found_at, hosts = _discovered
+
+    if monotonic() - found_at < DISCOVERY_TTL:
+      return hosts
+
+  def discover() -> Optional[list[Host]]:
+    return _race_discovery() or None
+
+  hosts = tuple(_retry_with_backoff(
+    discover,
+    base=retry_wait,
+    max_attempts=DISCOVERY_ATTEMPTS,
+  ) or ())
+
+  # don't hold on to empty results, the device might show up soon
+  _discovered = (monotonic(), hosts) if hosts else None
+
+  return hosts
+
+
+def get_devices(
+  retry_wait: Optional[float] = DEFAULT_RETRY_WAIT
+) -> list[Device]:
+  '''New, unconnected `Device`s for each call, only discovery is cached'''
+  return [
+    device
+    for host in _discover_hosts(retry_wait)
+    if (device := get_chromecast_from_host(host, retry_wait=retry_wait))
+  ]
+
+
+def get_first(
+  devices: list[Device],
+  tried: Optional[set[int]] = None,
+) -> Optional[Device]:
+  tried = set() if tried is None else tried
+
+  # skip devices that went away since they were discovered
+  for device in devices:
+    if _connect_once(device, tried):
+      return device
+
+  return None
+
+
+def _filter_by_uuid(
+  devices: list[Device],
   uuid: Optional[str] = None,
-  retry_wait: Optional[float] = DEFAULT_RETRY_WAIT,
+  tried: Optional[set[int]] = None,
 ) -> Optional[Device]:
-  devices = get_devices(retry_wait)
+  tried = set() if tried is None else tried
 
   if not uuid:
-    return get_first(devices)
+    return get_first(devices, tried)
 
   uuid = UUID(uuid)
 
   for device in devices:
-    if device.uuid == uuid:
-      device.wait()
-
+    if device.uuid == uuid and _connect_once(device, tried):
       return device
 
   return None
 
 
-def get_device(
+def _filter_by_name(
+  devices: list[Device],
   name: Optional[str] = None,
-  retry_wait: Optional[float] = DEFAULT_RETRY_WAIT,
+  tried: Optional[set[int]] = None,
 ) -> Optional[Device]:
-  devices = get_devices(retry_wait)
+  tried = set() if tried is None else tried
 
   if not name:
-    return get_first(devices)
+    return get_first(devices, tried)
 
   name = name.casefold()
 
   for device in devices:
-    if device.name.casefold() == name:
-      device.wait()
-
+    if device.name.casefold() == name and _connect_once(device, tried):
       return device
 
   return None
 
 
+def get_device_via_uuid(
+  uuid: Optional[str] = None,
+  retry_wait: Optional[float] = DEFAULT_RETRY_WAIT,
+) -> Optional[Device]:
+  devices = get_devices(retry_wait)
+
+  return _filter_by_uuid(devices, uuid)
+
+
+def _stream_device_by_name(
+  name: str,
+  retry_wait: Optional[float] = DEFAULT_RETRY_WAIT,
+  timeout: float = STREAM_TIMEOUT,
+) -> Optional[Device]:
+  """
+    Connect to devices named `name` as soon as mDNS reports them,
+    instead of waiting for the browse to finish first. SSDP is
+    only searched if mDNS finds no match in `timeout`.
+  """
+  name = name.casefold()
+  matched = Event()
+  closed = Event()
+  lock = Lock()
+  connecting: dict[Future[Optional[Device]], Device] = {}
+  executor = ThreadPoolExecutor(WAIT_WORKERS)
+  winner: Optional[Device] = None
+
+  def connect(device: Device):
+    with lock:
+      if closed.is_set():
+        return
+
+      connecting[executor.submit(_wait_for_connection, device)] = device
+
+    matched.set()
+
+  def on_discover(device: Device):
+    if device.name.casefold() == name:
+      connect(device)
+
+  browser = get_chromecasts(
+    retry_wait=retry_wait,
+    blocking=False,
+    callback=on_discover,
+  )
+
+  try:
+    if not matched.wait(timeout):
+      for host in _discover_via_ssdp():
+        if host.friendly_name.casefold() == name:
+          connect(get_chromecast_from_host(host, retry_wait=retry_wait))
+
+    with lock:
+      pending = set(connecting)
+
+    while pending and not winner:
+      done, pending = wait_futures(
+        pending,
+        timeout=CONNECT_TIMEOUT,
+        return_when=FIRST_COMPLETED
+      )
+
+      if not done:
+        break
+
+      for future in done:
+        if not future.exception() and (device := future.result()):
+          winner = device
+          break
+
+    return winner
+
+  finally:
+    browser.stop_discovery()
+
+    with lock:
+      closed.set()
+      losers = [
+        (future, device)
+        for future, device in connecting.items()
+        if device is not winner
+      ]
+
+    for future, device in losers:
+      # devices that never started connecting have nothing to tear down
+      if not future.cancel():
+        _disconnect(device)
+
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_device(
+  name: Optional[str] = None,
+  retry_wait: Optional[float] = DEFAULT_RETRY_WAIT,
+) -> Optional[Device]:
+  if not name:
+    return get_first(get_devices(retry_wait))
+
+  return _stream_device_by_name(name, retry_wait)
+
+
 def find_device(
   name: Optional[str] = DEFAULT_NAME,
   host: Optional[str] = None,
   uuid: Optional[str] = None,
   retry_wait: Optional[float] = DEFAULT_RETRY_WAIT,
 ) -> Optional[Device]:
-  device: Optional[Device] = None
+  if host and (device := get_device_via_host(host, name, retry_wait)):
+    return device
 
-  if host:
-    device = get_device_via_host(host, name, retry_wait)
+  no_identifiers = not (host or name or uuid)
 
-  if uuid and not device:
-    device = get_device_via_uuid(uuid, retry_wait)
+  if not (uuid or name or no_identifiers):
+    return None
 
-  if name and not device:
-    device = get_device(name, retry_wait)
+  if name and not uuid:
+    return get_device(name, retry_wait)
 
-  no_identifiers = not (host or name or uuid)
+  # discover once, then filter the results in memory
+  devices = get_devices(retry_wait)
+  tried: set[int] = set()
+
+  if uuid and (device := _filter_by_uuid(devices, uuid, tried)):
+    return device
+
+  if name and (device := _filter_by_name(devices, name, tried)):
+    return device
 
   if no_identifiers:
-    device = get_device(retry_wait=retry_wait)
+    return get_first(devices)
 
-  return device
+  return None
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import logging
-from decimal import Decimal
+import re
+from dataclasses import dataclass
 from enum import StrEnum
 from mimetypes import guess_type
-from typing import Any, NamedTuple, Optional, Self
-from urllib.parse import parse_qs, urlparse
+from threading import Lock
+from typing import Any, NamedTuple, Optional, Self, TypeVar
+from urllib.parse import urlparse
 
 # from pychromecast.controllers.yleareena import YleAreenaController
 # from pychromecast.controllers.homeassistant import HomeAssistantController
@@ -18,7 +20,8 @@ from mpris_server import (
   ValidMetadata, Volume, get_track_id
 )
 from pychromecast.controllers.dashcast import DashCastController
-from pychromecast.controllers.media import BaseController, MediaController, MediaStatus
+from pychromecast.controllers.media import BaseController, MEDIA_PLAYER_STATE_BUFFERING, \
+  MEDIA_PLAYER_STATE_PAUSED, MEDIA_PLAYER_STATE_PLAYING, MediaController, MediaStatus
 from pychromecast.controllers.plex import PlexController
 from pychromecast.controllers.receiver import CastStatus
 from pychromecast.controllers.supla import SuplaController
@@ -33,27 +36,76 @@ from ..types import Final, Protocol
 
 
 RESOLUTION: Final[int] = 1
+HALF_US: Final[float] = 0.5
+HALF_SEC_IN_US: Final[int] = US_IN_SEC // 2
 MAX_TITLES: Final[int] = 3
 
 NO_ARTIST: Final[str] = ''
 NO_SUFFIX: Final[str] = ''
 
-SKIP_FIRST: Final[slice] = slice(1, None)
-VIDEO_QS: Final[str] = 'v'
+# shared between metadata reads, never mutate these
+NO_ARTISTS: Final[list[str]] = []
+NO_COMMENTS: Final[list[str]] = []
+
+LIGHT_THUMB_STR: Final[str] = str(LIGHT_THUMB)
+DEFAULT_THUMB_STR: Final[str] = str(DEFAULT_THUMB)
+
+C = TypeVar('C', bound=BaseController)
+
+YT_ID_PATTERN: Final[re.Pattern[str]] = re.compile(
+  r'^https?://(?:www\.|m\.)?'
+  r'(?:youtube\.com/watch\?(?:[^&]*&)*v=([A-Za-z0-9_-]{6,})'
+  r'|youtu\.be/([A-Za-z0-9_-]{6,}))',
+  re.IGNORECASE
+)
+
+# same states pychromecast treats as `is_playing`
+PLAYING_STATES: Final[frozenset[str]] = frozenset({
+  MEDIA_PLAYER_STATE_PLAYING,
+  MEDIA_PLAYER_STATE_BUFFERING,
+})
+
+# checked in order, first match wins
+MEDIA_TYPES: Final[tuple[tuple[str, MediaType], ...]] = (
+  ('media_is_movie', MediaType.MOVIE),
+  ('media_is_tvshow', MediaType.TVSHOW),
+  ('media_is_photo', MediaType.PHOTO),
+  ('media_is_musictrack', MediaType.MUSICTRACK),
+  ('media_is_generic', MediaType.GENERIC),
+)
+
+URL_PREFIXES: Final[tuple[str, ...]] = ('http://', 'https://')
+WWW_PREFIX: Final[str] = 'www.'
+YT_LONG: Final[str] = 'youtube.com'
+YT_SHORT: Final[str] = 'youtu.be'
+YT_WATCH: Final[str] = f'https://{YT_LONG}/watch?v='
+YT_NETLOCS: Final[frozenset[str]] = frozenset({
+  YT_LONG,
+  f'm.{YT_LONG}',
+  YT_SHORT,
+})
+YT_PREFIXES: Final[tuple[str, ...]] = (
+  'http://youtu',
+  'https://youtu',
+  'http://www.youtu',
+  'https://www.youtu',
+  'http://m.youtu',
+  'https://m.youtu',
+)
 
 
 class YoutubeUrl(StrEnum):
-  long: Self = 'youtube.com'
-  short: Self = 'youtu.be'
+  long: Self = YT_LONG
+  short: Self = YT_SHORT
 
-  watch: Self = f'https://{long}/watch?v='
+  watch: Self = YT_WATCH
 
   @classmethod
   def get_url(cls: type[Self], content_id: str | None) -> str | None:
     if not content_id:
       return None
 
-    return f"{cls.watch}{content_id}"
+    return f"{YT_WATCH}{content_id}"
 
   @classmethod
   def is_youtube(cls: type[Self], uri: str | None) -> bool:
@@ -75,17 +127,66 @@ class Titles(NamedTuple):
   album: Optional[str] = None
 
 
-class Controllers(NamedTuple):
-  yt: Optional[YouTubeController] = None
-  dash: Optional[DashCastController] = None
-  plex: Optional[PlexController] = None
-  supla: Optional[SuplaController] = None
-  # bbc_ip: BbcIplayerController = None
-  # bbc_sound: BbcSoundsController = None
-  # bubble: BubbleUPNPController = None
-  # yle: YleAreenaController = None
-  # plex_api: PlexApiController = None
-  # ha: HomeAssistantController = None
+@dataclass(frozen=True, slots=True)
+class MediaSnapshot:
+  '''Device state read once and shared by everything a metadata read needs'''
+  media_status: Optional[MediaStatus] = None
+  cast_status: Optional[CastStatus] = None
+  title: Optional[str] = None
+  app_id: Optional[str] = None
+  app_name: Optional[str] = None
+
+
+CachedTrackId = tuple[str, DbusObj]
+
+
+class Controllers:
+  """
+    YouTube is registered up front, it's checked on every metadata read
+    and must see `channel_connected()`. The rest are created and
+    registered on first access.
+  """
+
+  __slots__ = ('_dev', '_lock', 'yt', '_dash', '_plex', '_supla')
+
+  def __init__(self, dev: Device):
+    self._dev = dev
+    self._lock = Lock()
+    self.yt: YouTubeController = self._register(YouTubeController())
+    self._dash: Optional[DashCastController] = None
+    self._plex: Optional[PlexController] = None
+    self._supla: Optional[SuplaController] = None
+    # bbc_ip: BbcIplayerController = None
+    # bbc_sound: BbcSoundsController = None
+    # bubble: BubbleUPNPController = None
+    # yle: YleAreenaController = None
+    # plex_api: PlexApiController = None
+    # ha: HomeAssistantController = None
+
+  def _register(self, controller: C) -> C:
+    self._dev.register_handler(controller)
+    return controller
+
+  def _get_or_create(self, attr: str, controller_type: type[C]) -> C:
+    # callers run on both the D-Bus and pychromecast socket threads
+    with self._lock:
+      if (controller := getattr(self, attr)) is None:
+        controller = self._register(controller_type())
+        setattr(self, attr, controller)
+
+    return controller
+
+  @property
+  def dash(self) -> DashCastController:
+    return self._get_or_create('_dash', DashCastController)
+
+  @property
+  def plex(self) -> PlexController:
+    return self._get_or_create('_plex', PlexController)
+
+  @property
+  def supla(self) -> SuplaController:
+    return self._get_or_create('_supla', SuplaController)
 
 
 class Wrapper(Protocol):
@@ -117,6 +218,12 @@ class Wrapper(Protocol):
   def titles(self) -> Titles:
     pass
 
+  def _snapshot(self) -> MediaSnapshot:
+    pass
+
+  def _get_titles(self, snap: MediaSnapshot) -> Titles:
+    pass
+
   def on_new_status(self, *args, **kwargs):
     '''Callback for event listener'''
     pass
@@ -135,6 +242,18 @@ class StatusMixin(Wrapper):
   def media_controller(self) -> MediaController:
     return self.dev.media_controller
 
+  def _snapshot(self) -> MediaSnapshot:
+    dev = self.dev
+    controller = dev.media_controller
+
+    return MediaSnapshot(
+      media_status=controller.status or None,
+      cast_status=dev.status or None,
+      title=controller.title,
+      app_id=dev.app_id,
+      app_name=dev.app_display_name,
+    )
+
 
 class ControllersMixin(Wrapper):
   def __init__(self):
@@ -142,25 +261,7 @@ class ControllersMixin(Wrapper):
     super().__init__()
 
   def _setup_controllers(self):
-    self.ctls = Controllers(
-      YouTubeController(),
-      DashCastController(),
-      PlexController(),
-      SuplaController(),
-      # BbcIplayerController(),
-      # BbcSoundsController(),
-      # BubbleUPNPController(),
-      # YleAreenaController(),
-      # PlexApiController(),
-      # HomeAssistantController(),
-    )
-
-    for ctl in self.ctls:
-      if ctl:
-        self._register(ctl)
-
-  def _register(self, controller: BaseController):
-    self.dev.register_handler(controller)
+    self.ctls = Controllers(self.dev)
 
   def _launch_youtube(self):
     self.ctls.yt.launch()
@@ -177,26 +278,30 @@ class ControllersMixin(Wrapper):
     if not content_id or not self.ctls.yt.is_active:
       return False
 
-    return not content_id.startswith('http')
+    return not content_id.startswith(URL_PREFIXES)
 
-  def _get_url(self) -> Optional[str]:
+  def _get_url(self, snap: Optional[MediaSnapshot] = None) -> Optional[str]:
+    snap = snap or self._snapshot()
     content_id: str | None = None
 
-    if self.media_status:
-      content_id = self.media_status.content_id
+    if status := snap.media_status:
+      content_id = status.content_id
 
     if self._is_youtube_vid(content_id):
       return YoutubeUrl.get_url(content_id)
 
     return content_id
 
+  def _play_media(self, uri: str):
+    mimetype, _ = guess_type(uri)
+    self.media_controller.play_media(uri, mimetype)
+
   def open_uri(self, uri: str):
     if video_id := get_content_id(uri):
       self._play_youtube(video_id)
       return
 
-    mimetype, _ = guess_type(uri)
-    self.media_controller.play_media(uri, mimetype)
+    self._play_media(uri)
 
   def add_track(
     self,
@@ -204,60 +309,59 @@ class ControllersMixin(Wrapper):
     after_track: DbusObj,
     set_as_current: bool
   ):
-    yt = self.ctls.yt
+    if not (video_id := get_content_id(uri)):
+      if set_as_current:
+        self._play_media(uri)
 
-    if video_id := get_content_id(uri):
-      yt.add_to_queue(video_id)
+      return
 
-    if video_id and set_as_current:
-      yt.play_video(video_id)
+    yt = self.ctls.yt
+    yt.add_to_queue(video_id)
 
-    elif set_as_current:
-      self.open_uri(uri)
+    if set_as_current:
+      yt.play_video(video_id)
 
 
 class TitlesMixin(Wrapper):
   @property
   def titles(self) -> Titles:
-    titles: list[str] = list()
-
-    if title := self.media_controller.title:
-      titles.append(title)
-
-    if (status := self.media_status) and (series_title := status.series_title):
-      titles.append(series_title)
+    return self._get_titles(self._snapshot())
 
-    if subtitle := self.get_subtitle():
-      titles.append(subtitle)
+  def _get_titles(self, snap: MediaSnapshot) -> Titles:
+    titles: list[str] = list()
+    status = snap.media_status
+
+    candidates = (
+      snap.title,
+      status.series_title if status else None,
+      get_subtitle(status),
+      status.artist if status else None,
+      status.album_name if status else None,
+      snap.app_name,
+    )
 
-    if status:
-      if artist := status.artist:
-        titles.append(artist)
+    for candidate in candidates:
+      if not candidate:
+        continue
 
-      if album := status.album_name:
-        titles.append(album)
+      titles.append(candidate)
 
-    if app_name := self.dev.app_display_name:
-      titles.append(app_name)
+      if len(titles) == MAX_TITLES:
+        break
 
     if not titles:
       titles.append(TITLE)
 
-    titles = titles[:MAX_TITLES]
+    size = len(titles)
 
-    return Titles(*titles)
+    return Titles(
+      titles[0] if size > 0 else None,
+      titles[1] if size > 1 else None,
+      titles[2] if size > 2 else None,
+    )
 
   def get_subtitle(self) -> Optional[str]:
-    if not self.media_status:
-      return None
-
-    if not (metadata := self.media_status.media_metadata):
-      return None
-
-    if subtitle := metadata.get('subtitle'):
-      return subtitle
-
-    return None
+    return get_subtitle(self.media_status)
 
 
 class TimeMixin(Wrapper):
@@ -269,24 +373,20 @@ class TimeMixin(Wrapper):
 
   @property
   def current_time(self) -> Optional[float]:
-    status = self.media_status
-
-    if not status:
-      return None
+    return get_current_time(self.media_status)
 
-    return status.adjusted_current_time or status.current_time
-
-  def get_duration(self) -> Microseconds:
+  def get_duration(self, snap: Optional[MediaSnapshot] = None) -> Microseconds:
+    status = snap.media_status if snap else self.media_status
     duration: Optional[int] = None
 
-    if self.media_status:
-      duration = self.media_status.duration
+    if status:
+      duration = status.duration
 
     if duration is not None:
       return duration * US_IN_SEC
 
     longest: int = self._longest_duration
-    current = self.get_current_position()
+    current = get_position(get_current_time(status))
 
     if longest and longest > current:
       return longest
@@ -298,13 +398,7 @@ class TimeMixin(Wrapper):
     return NO_DURATION
 
   def get_current_position(self) -> Microseconds:
-    position_secs = self.current_time
-
-    if not position_secs:
-      return BEGINNING
-
-    position_us = position_secs * US_IN_SEC
-    return round(position_us)
+    return get_position(self.current_time)
 
   def on_new_status(self, *args, **kwargs):
     # super().on_new_status(*args, **kwargs)
@@ -322,14 +416,14 @@ class TimeMixin(Wrapper):
     return current_time > BEGINNING
 
   def seek(self, time: Microseconds):
-    seconds = int(round(time / US_IN_SEC))
+    seconds = int(time + HALF_SEC_IN_US) // US_IN_SEC
     self.media_controller.seek(seconds)
 
   def get_rate(self) -> Rate:
-    if not self.media_status:
+    if not (status := self.media_status):
       return DEFAULT_RATE
 
-    if rate := self.media_status.playback_rate:
+    if rate := status.playback_rate:
       return rate
 
     return DEFAULT_RATE
@@ -339,39 +433,42 @@ class TimeMixin(Wrapper):
 
 
 class IconsMixin(Wrapper):
-  def _set_cached_icon(self, url: Optional[str] = None):
+  def _set_cached_icon(self, snap: MediaSnapshot, url: Optional[str] = None):
     if not url:
       self.cached_icon = None
       return
 
-    app_id = self.dev.app_id
-    title, *_ = self.titles
-    self.cached_icon = CachedIcon(url, app_id, title)
+    title, *_ = self._get_titles(snap)
+    self.cached_icon = CachedIcon(url, snap.app_id, title)
 
-  def _can_use_cache(self) -> bool:
+  def _can_use_cache(self, snap: MediaSnapshot) -> bool:
     if not (icon := self.cached_icon) or not icon.url:
       return False
 
-    app_id = self.dev.app_id
-    title, *_ = self.titles
+    # cheap check first, titles are only needed for the same app
+    if icon.app_id != snap.app_id:
+      return False
+
+    title, *_ = self._get_titles(snap)
 
-    return icon.app_id == app_id and icon.title == title
+    return icon.title == title
 
-  def _get_icon_from_device(self) -> Optional[str]:
+  def _get_icon_from_device(self, snap: MediaSnapshot) -> Optional[str]:
     url: str | None
+    status = snap.media_status
 
-    if images := self.media_status.images:
+    if status and (images := status.images):
       first, *_ = images
       url, *_ = first
 
-      self._set_cached_icon(url)
+      self._set_cached_icon(snap, url)
       return url
 
-    if self.cast_status and (url := self.cast_status.icon_url):
-      self._set_cached_icon(url)
+    if (cast_status := snap.cast_status) and (url := cast_status.icon_url):
+      self._set_cached_icon(snap, url)
       return url
 
-    if not self._can_use_cache():
+    if not self._can_use_cache(snap):
       return None
 
     return self.cached_icon.url
@@ -379,12 +476,16 @@ class IconsMixin(Wrapper):
   @ensure_user_dirs_exist
   def _get_default_icon(self) -> str:
     if self.light_icon:
-      return str(LIGHT_THUMB)
+      return LIGHT_THUMB_STR
 
-    return str(DEFAULT_THUMB)
+    return DEFAULT_THUMB_STR
 
-  def get_art_url(self, track: Optional[int] = None) -> str:
-    if icon := self._get_icon_from_device():
+  def get_art_url(
+    self,
+    track: Optional[int] = None,
+    snap: Optional[MediaSnapshot] = None,
+  ) -> str:
+    if icon := self._get_icon_from_device(snap or self._snapshot()):
       return icon
 
     return self._get_default_icon()
@@ -406,22 +507,40 @@ class IconsMixin(Wrapper):
 
 
 class MetadataMixin(Wrapper):
+  _track_id_cache: Optional[CachedTrackId] = None
+
+  def __init__(self):
+    self._track_id_cache = None
+    super().__init__()
+
+  def _get_track_id(self, title: str) -> DbusObj:
+    if (cached := self._track_id_cache) and cached[0] == title:
+      _, track_id = cached
+      return track_id
+
+    track_id = get_track_id(title)
+    self._track_id_cache = title, track_id
+
+    return track_id
+
   def metadata(self) -> ValidMetadata:
-    title, artist, album = self.titles
+    snap = self._snapshot()
+    titles = self._get_titles(snap)
+    title, artist, album = titles
 
-    dbus_name: DbusObj = get_track_id(title)
-    artists: list[str] = [artist] if artist else []
-    comments: list[str] = []
+    dbus_name: DbusObj = self._get_track_id(title)
+    artists: list[str] = [artist] if artist else NO_ARTISTS
+    comments: list[str] = NO_COMMENTS
     track_no: Optional[int] = None
 
-    if self.media_status:
-      track_no = self.media_status.track
+    if status := snap.media_status:
+      track_no = status.track
 
     return MetadataObj(
       track_id=dbus_name,
-      length=self.get_duration(),
-      art_url=self.get_art_url(),
-      url=self._get_url(),
+      length=self.get_duration(snap),
+      art_url=self.get_art_url(snap=snap),
+      url=self._get_url(snap),
       title=title,
       artists=artists,
       album=album,
@@ -434,10 +553,15 @@ class MetadataMixin(Wrapper):
 
 class PlaybackMixin(Wrapper):
   def get_playstate(self) -> PlayState:
-    if self.media_controller.is_playing:
+    if not (status := self.media_status):
+      return PlayState.STOPPED
+
+    state = status.player_state
+
+    if state in PLAYING_STATES:
       return PlayState.PLAYING
 
-    elif self.media_controller.is_paused:
+    elif state == MEDIA_PLAYER_STATE_PAUSED:
       return PlayState.PAUSED
 
     return PlayState.STOPPED
@@ -493,19 +617,17 @@ class VolumeMixin(Wrapper):
     #super().__init__()
 
   def get_volume(self) -> Optional[Volume]:
-    if not self.cast_status:
+    if not (status := self.cast_status):
       return None
 
-    return Decimal(self.cast_status.volume_level)
+    # `Volume` is a `Decimal` in mpris_server, keep it at the MPRIS boundary
+    return Volume(status.volume_level)
 
   def set_volume(self, val: Volume):
-    val = Decimal(val)
-    curr = self.get_volume()
-
-    if curr is None:
+    if not (status := self.cast_status):
       return
 
-    delta: float = float(val - curr)
+    delta: float = float(val) - float(status.volume_level)
 
     # can't adjust vol by 0
     if delta > NO_DELTA:  # vol up
@@ -599,44 +721,57 @@ def get_media_type(
   if not status:
     return None
 
-  if status.media_is_movie:
-    return MediaType.MOVIE
+  return next(
+    (media_type for attr, media_type in MEDIA_TYPES if getattr(status, attr)),
+    None
+  )
 
-  elif status.media_is_tvshow:
-    return MediaType.TVSHOW
 
-  elif status.media_is_photo:
-    return MediaType.PHOTO
+def get_subtitle(status: Optional[MediaStatus]) -> Optional[str]:
+  if not status:
+    return None
 
-  elif status.media_is_musictrack:
-    return MediaType.MUSICTRACK
+  if not (metadata := status.media_metadata):
+    return None
 
-  elif status.media_is_generic:
-    return MediaType.GENERIC
+  if subtitle := metadata.get('subtitle'):
+    return subtitle
 
   return None
 
 
+def get_current_time(status: Optional[MediaStatus]) -> Optional[float]:
+  if not status:
+    return None
+
+  return status.adjusted_current_time or status.current_time
+
+
+def get_position(position_secs: Optional[float]) -> Microseconds:
+  if not position_secs:
+    return BEGINNING
+
+  # round half away from zero without going through round()
+  half = HALF_US if position_secs >= 0 else -HALF_US
+
+  return int(position_secs * US_IN_SEC + half)
+
+
 def is_youtube(uri: str) -> bool:
   uri = uri.casefold()
-  parsed = urlparse(uri)
 
-  return any(url in parsed.netloc for url in YoutubeUrl)
+  if not uri.startswith(YT_PREFIXES):
+    return False
 
+  netloc = urlparse(uri).netloc.removeprefix(WWW_PREFIX)
 
-def get_content_id(uri: str) -> Optional[str]:
-  if not YoutubeUrl.is_youtube(uri):
-    return None
+  return netloc in YT_NETLOCS
 
-  content_id: str | None = None
-  parsed = urlparse(uri)
 
-  match parsed.netloc:
-    case YoutubeUrl.long:
-      qs = parse_qs(parsed.query)
-      [content_id] = qs[VIDEO_QS]
+def get_content_id(uri: str) -> Optional[str]:
+  if not (match := YT_ID_PATTERN.match(uri)):
+    return None
 
-    case YoutubeUrl.short:
-      content_id = parsed.path[SKIP_FIRST]
+  long_id, short_id = match.groups()
 
-  return content_id
+  return long_id or short_id